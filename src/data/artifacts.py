@@ -0,0 +1,148 @@
+"""
+Deterministic, content-addressed loader outputs.
+
+Loaders print their JSON through `publish`, which serializes it canonically
+(sorted keys, stable row order, ISO dates, no NaN) so that identical data always
+produces identical bytes, and Observable's loader cache and the deployed assets
+stay valid. If a loader passes its `inputs`, the hash of those inputs and of the
+source of the loader and the local modules it imported is recorded next to the
+output, and the stored output is reused without recomputation while both are
+unchanged.
+
+`python artifacts.py digest` prints one hash over all outputs, which the daily
+build compares with the last deployed one to skip redeploying unchanged data.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sys
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+from util import STATE_DIR, load_state, save_state, state_lock
+
+ARTIFACT_DIR = STATE_DIR / "artifacts"
+DATA_DIR = Path(__file__).parent
+
+
+def normalize(value: Any) -> Any:
+    """Convert a value to plain JSON types, with dates as ISO strings."""
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Series)):
+        return [normalize(item) for item in value]
+    if isinstance(value, pd.DataFrame):
+        return records(value)
+    if isinstance(value, datetime):
+        if pd.isna(value):
+            return None
+        if value.time() == time(0):
+            return value.strftime("%Y-%m-%d")
+        return value.isoformat(timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+def records(df: pd.DataFrame) -> list[dict[str, Any]]:
+    """A frame as JSON records in a stable row order."""
+    rows = [normalize(row) for row in df.to_dict(orient="records")]
+    # Sort by the values in column order, so e.g. a leading date column sorts first
+    return sorted(rows, key=lambda row: json.dumps(list(row.values())))
+
+
+def canonical_json(obj: Any) -> str:
+    return json.dumps(
+        normalize(obj), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+
+
+def content_hash(*parts: Any) -> str:
+    """Hash of arbitrary inputs; frames are hashed by their values."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, dict):
+            for key in sorted(part):
+                digest.update(canonical_json(key).encode())
+                digest.update(content_hash(part[key]).encode())
+        elif isinstance(part, (pd.DataFrame, pd.Series)):
+            frame = pd.DataFrame(part)
+            digest.update(canonical_json(list(frame.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(frame).to_numpy().tobytes())
+        else:
+            digest.update(canonical_json(part).encode())
+    return digest.hexdigest()
+
+
+def source_hash(loader_path: str) -> str:
+    """Hash of the loader's source and of the local modules loaded so far."""
+    paths = {Path(loader_path).resolve()}
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and Path(path).resolve().parent == DATA_DIR.resolve():
+            paths.add(Path(path).resolve())
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def publish(loader_path: str, compute: Callable[[], Any], inputs: Any = None) -> None:
+    """
+    Print the loader's output as canonical JSON.
+    With `inputs`, the stored output is reused when the inputs and the source of the
+    loader and its local modules are unchanged; without, the output is always
+    recomputed.
+    """
+    name = os.path.basename(loader_path).removesuffix(".py")
+    manifest = load_state("artifacts")
+    entry = manifest.get(name, {})
+    input_hash = None
+    if inputs is not None:
+        input_hash = content_hash(source_hash(loader_path), inputs)
+        path = ARTIFACT_DIR / f"{entry.get('output')}.json"
+        if entry.get("inputs") == input_hash and path.exists():
+            sys.stdout.write(path.read_text(encoding="utf-8"))
+            return
+
+    output = canonical_json(compute())
+    output_hash = hashlib.sha256(output.encode()).hexdigest()
+    path = ARTIFACT_DIR / f"{output_hash}.json"
+    if not path.exists():
+        ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(output, encoding="utf-8")
+    # Observable runs loaders concurrently, so update the manifest under a lock
+    with state_lock("artifacts"):
+        manifest = load_state("artifacts")
+        old_output = manifest.get(name, {}).get("output")
+        manifest[name] = {"inputs": input_hash, "output": output_hash}
+        save_state("artifacts", manifest)
+        if old_output not in [entry["output"] for entry in manifest.values()]:
+            (ARTIFACT_DIR / f"{old_output}.json").unlink(missing_ok=True)
+    sys.stdout.write(output)
+
+
+def digest() -> str:
+    """Hash over the current outputs of all loaders."""
+    manifest = load_state("artifacts")
+    return content_hash({name: entry["output"] for name, entry in manifest.items()})
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["digest"]:
+        print(digest())
+    else:
+        print("Usage: python artifacts.py digest", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,176 @@
+"""
+Warm data daemon.
+
+Every loader is its own short-lived interpreter, so most of a warm rebuild goes to
+importing pandas & co. and re-opening the caches. `python daemon.py` starts a
+long-lived process that keeps those modules loaded, runs the loaders in-process and
+keeps their output in memory. The loaders call `request_artifact` first thing: if
+the daemon is running they print its answer and exit, otherwise they carry on as
+usual. Outputs are recomputed on a new day, after `--max-age` seconds, or when any
+Python file in `src/data` changes; the local modules (including loaders imported
+via `util.import_loader`) are then re-imported, except for this one.
+
+This module must only import the standard library at the top level, since the
+loaders import it before anything else.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import runpy
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from datetime import date
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+SOCKET_PATH = os.path.join(DATA_DIR, ".cache", "daemon.sock")
+
+# Set inside the daemon, so loaders it runs don't try to call themselves
+_serving = False
+
+
+def request_artifact(loader_path: str) -> None:
+    """Print the loader's output from the daemon and exit, if the daemon is running."""
+    # Only when run as a script, not when imported by another loader
+    if _serving or os.path.abspath(sys.argv[0]) != os.path.abspath(loader_path):
+        return
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(SOCKET_PATH)
+            sock.sendall(os.path.basename(loader_path).encode() + b"\n")
+            with sock.makefile("rb") as response:
+                status = response.readline().strip()
+                payload = response.read()
+    except OSError:
+        return  # not running, run in-process
+    if status != b"OK":
+        print("Daemon failed, running in-process:", file=sys.stderr)
+        print(payload.decode(errors="replace"), file=sys.stderr)
+        return
+    sys.stdout.buffer.write(payload)
+    sys.stdout.flush()
+    sys.exit(0)
+
+
+def run_loader(path: str) -> bytes:
+    """Run a loader in this process and return what it prints."""
+    start = time.monotonic()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        runpy.run_path(path, run_name="__main__")
+    name = os.path.basename(path)
+    print(f"{name}: {time.monotonic() - start:.1f}s", file=sys.stderr)
+    return output.getvalue().encode()
+
+
+def sources_version() -> tuple[tuple[str, float], ...]:
+    """Modification times of all Python files next to the loaders."""
+    return tuple(
+        (name, os.path.getmtime(os.path.join(DATA_DIR, name)))
+        for name in sorted(os.listdir(DATA_DIR))
+        if name.endswith(".py")
+    )
+
+
+def unload_local_modules() -> None:
+    """Drop the modules loaded from `DATA_DIR`, so that they are imported afresh."""
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if (
+            path
+            and os.path.dirname(os.path.abspath(path)) == DATA_DIR
+            and name not in ("__main__", __name__)
+        ):
+            del sys.modules[name]
+
+
+class LoaderHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        name = self.rfile.readline().decode().strip()
+        try:
+            payload = self.server.get_artifact(name)
+        except Exception:
+            self.wfile.write(b"ERR\n" + traceback.format_exc().encode())
+        else:
+            self.wfile.write(b"OK\n" + payload)
+
+
+class DataDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self.version = sources_version()
+        # name -> (day, timestamp, output)
+        self.artifacts: dict[str, tuple[date, float, bytes]] = {}
+        # Loaders write to the global stdout, so they run one at a time
+        self.lock = threading.Lock()
+        super().__init__(SOCKET_PATH, LoaderHandler)
+
+    def get_artifact(self, name: str) -> bytes:
+        path = os.path.join(DATA_DIR, os.path.basename(name))
+        if not os.path.isfile(path):
+            raise FileNotFoundError(name)
+        hit = self.artifacts.get(name)
+        if hit and self._is_fresh(hit) and sources_version() == self.version:
+            return hit[2]
+        with self.lock:
+            version = sources_version()
+            if version != self.version:
+                # A loader or shared module changed, which may affect any output
+                unload_local_modules()
+                self.artifacts.clear()
+                self.version = version
+            # Another request may have computed it while we were waiting
+            hit = self.artifacts.get(name)
+            if hit and self._is_fresh(hit):
+                return hit[2]
+            payload = run_loader(path)
+            self.artifacts[name] = (date.today(), time.time(), payload)
+            return payload
+
+    def _is_fresh(self, hit: tuple[date, float, bytes]) -> bool:
+        day, timestamp, _ = hit
+        return day == date.today() and time.time() - timestamp < self.max_age
+
+
+def serve(max_age: float) -> None:
+    global _serving
+    _serving = True
+    # Pay for the heavy imports and cache setup once
+    import mediacloud.api  # noqa: F401
+    import number_parser  # noqa: F401
+    import pandas  # noqa: F401
+    import requests  # noqa: F401
+    import tqdm.auto  # noqa: F401
+    import util  # noqa: F401
+
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+    with DataDaemon(max_age=max_age) as server:
+        print(f"Serving data loaders on {SOCKET_PATH}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(SOCKET_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=3600,
+        help="seconds to keep a loader's output in memory (default: 3600)",
+    )
+    args = parser.parse_args()
+    # Run as the importable `daemon` module, so the loaders see `_serving`
+    import daemon
+
+    daemon.serve(max_age=args.max_age)
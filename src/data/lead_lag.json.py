@@ -0,0 +1,55 @@
+from daemon import request_artifact
+
+request_artifact(__file__)
+
+from datetime import date
+
+import pandas as pd
+
+from artifacts import publish
+from lead_lag import analyze, daily_counts, daily_polls
+from tiktok_snapshots import get_view_velocity
+from util import import_loader
+
+START_DATE = date(2023, 1, 1)
+MAX_LAG = 28  # days
+
+
+def get_sources(start_date: date, end_date: date) -> dict[str, pd.DataFrame]:
+    """Daily per-party attention signals, one frame per source."""
+    media = import_loader("media.json.py").get_mediacloud_party_counts(
+        start_date=start_date, end_date=end_date
+    )
+    rallies = import_loader("rallies.json.py").get_acled_events(
+        start_date=start_date, end_date=end_date
+    )
+    # Views per day between crawls, not summed onto the posting dates; crawling
+    # and recording the snapshots is left to the TikTok loaders
+    tiktok = get_view_velocity()
+    if not tiktok.empty:
+        tiktok = tiktok[tiktok.index >= pd.Timestamp(start_date)]
+    rally_counts = (
+        rallies[["date", "organizers_canonical"]]
+        .explode("organizers_canonical")
+        .groupby(["date", "organizers_canonical"])
+        .size()
+        .unstack(fill_value=0)
+    )
+    return {
+        "media": daily_counts(media.set_index("date")),
+        "rallies": daily_counts(rally_counts),
+        "tiktok": daily_counts(tiktok),
+    }
+
+
+if __name__ == "__main__":
+    end_date = date.today()
+    polls = import_loader("polls.json.py").get_polls_dots()
+    polls = daily_polls(polls[pd.to_datetime(polls["date"]) >= pd.Timestamp(START_DATE)])
+    sources = get_sources(START_DATE, end_date)
+    # The bootstrap is the expensive part, skip it if the series are unchanged
+    publish(
+        __file__,
+        lambda: analyze(sources, polls, max_lag=MAX_LAG),
+        inputs={"polls": polls} | sources,
+    )
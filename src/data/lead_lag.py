@@ -0,0 +1,150 @@
+"""
+Lagged cross-correlation between attention signals and polls.
+
+For every party × source pair, the daily source series (media mentions, rallies,
+TikTok views per day from the metric snapshots) and the party's poll series are aligned, linearly detrended and
+standardized, and their cross-correlation over a range of lags is computed with a
+single FFT. A positive lag means the source leads the polls by that many days.
+Significance comes from a moving-block bootstrap of the source series, which keeps
+its autocorrelation but breaks its alignment with the polls.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+def detrend(x: np.ndarray) -> np.ndarray:
+    """Remove a linear trend along the last axis and scale to unit variance."""
+    t = np.arange(x.shape[-1])
+    t = (t - t.mean()) / (t.std() or 1)
+    x = x - x.mean(axis=-1, keepdims=True)
+    x = x - (x @ t)[..., None] * t / len(t)
+    std = x.std(axis=-1, keepdims=True)
+    return np.divide(x, std, out=np.zeros_like(x), where=std > 0)
+
+
+def xcorr(x: np.ndarray, y: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    Cross-correlation of standardized series at lags -max_lag..max_lag via FFT.
+    `x` may be a batch of series (one per row); `y` is a single series.
+    Lag k correlates x[t] with y[t + k].
+    """
+    n = x.shape[-1]
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = np.conj(np.fft.rfft(x, size)) * np.fft.rfft(y, size)
+    full = np.fft.irfft(spectrum, size) / n
+    return np.concatenate([full[..., size - max_lag :], full[..., : max_lag + 1]], -1)
+
+
+def block_bootstrap(
+    x: np.ndarray, block_size: int, n_boot: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Resample a series from randomly placed (circular) blocks, `n_boot` times."""
+    n = len(x)
+    n_blocks = -(-n // block_size)
+    starts = rng.integers(0, n, size=(n_boot, n_blocks, 1))
+    index = (starts + np.arange(block_size)) % n
+    return x[index.reshape(n_boot, -1)[:, :n]]
+
+
+def lagged_correlation(
+    source: np.ndarray,
+    polls: np.ndarray,
+    max_lag: int,
+    n_boot: int,
+    block_size: int,
+    seed: int,
+) -> dict[str, Any]:
+    """
+    Lag profile of one aligned source/poll pair, with bootstrap p-values.
+    `p` holds the pointwise p-value per lag; `best_p` accounts for the choice of
+    the best lag by comparing with the maximum absolute null correlation over lags.
+    """
+    rng = np.random.default_rng(seed)
+    x, y = detrend(source), detrend(polls)
+    corr = xcorr(x, y, max_lag)
+    null = xcorr(detrend(block_bootstrap(source, block_size, n_boot, rng)), y, max_lag)
+    p = (1 + (np.abs(null) >= np.abs(corr)).sum(axis=0)) / (1 + n_boot)
+    best = int(np.argmax(np.abs(corr)))
+    # The best lag is picked out of all lags, so compare it with the best null lags
+    null_max = np.abs(null).max(axis=1)
+    best_p = (1 + (null_max >= np.abs(corr[best])).sum()) / (1 + n_boot)
+    return {
+        "corr": np.round(corr, 4).tolist(),
+        "p": np.round(p, 4).tolist(),
+        "best_lag": best - max_lag,
+        "best_corr": round(float(corr[best]), 4),
+        "best_p": round(float(best_p), 4),
+        "n": len(source),
+    }
+
+
+def _run_pair(args: tuple) -> dict[str, Any]:
+    party, source_name, source, polls, kwargs = args
+    return {"party": party, "source": source_name} | lagged_correlation(
+        source, polls, **kwargs
+    )
+
+
+def analyze(
+    sources: dict[str, pd.DataFrame],
+    polls: pd.DataFrame,
+    max_lag: int = 28,
+    n_boot: int = 500,
+    block_size: int = 14,
+    max_workers: int | None = None,
+) -> dict[str, Any]:
+    """
+    Compute lag profiles for every party × source pair.
+    `sources` maps a source name to a frame with a daily date index and one column
+    per party; `polls` has the same shape. Pairs are computed in parallel. Pairs
+    with fewer than `4 * max_lag` aligned days are listed under `skipped`.
+    """
+    tasks = []
+    skipped = []
+    for source_name, source_df in sources.items():
+        for party in polls.columns:
+            if party in source_df.columns:
+                pair = pd.concat([source_df[party], polls[party]], axis=1).dropna()
+            else:
+                pair = pd.DataFrame()
+            if len(pair) < 4 * max_lag:
+                skipped.append({"party": party, "source": source_name, "n": len(pair)})
+                continue
+            kwargs = {
+                "max_lag": max_lag,
+                "n_boot": n_boot,
+                "block_size": block_size,
+                "seed": len(tasks),
+            }
+            values = pair.to_numpy(dtype=float).T
+            tasks.append((party, source_name, values[0], values[1], kwargs))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pairs = list(executor.map(_run_pair, tasks))
+    return {
+        "lags": list(range(-max_lag, max_lag + 1)),
+        "pairs": pairs,
+        "skipped": skipped,
+    }
+
+
+def daily_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Sum a date-indexed frame per day, with zeros on days without data."""
+    df = df.groupby(pd.to_datetime(df.index)).sum()
+    if df.empty:
+        return df
+    return df.reindex(pd.date_range(df.index.min(), df.index.max()), fill_value=0)
+
+
+def daily_polls(df: pd.DataFrame) -> pd.DataFrame:
+    """Average long-format polls per day and party, interpolating between polls."""
+    df = df.assign(
+        date=pd.to_datetime(df["date"]).dt.normalize(),
+        value=pd.to_numeric(df["value"], errors="coerce"),
+    )
+    df = df.pivot_table(index="date", columns="party", values="value", aggfunc="mean")
+    df = df.reindex(pd.date_range(df.index.min(), df.index.max()))
+    return df.interpolate(limit_area="inside")
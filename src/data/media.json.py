@@ -1,10 +1,15 @@
+from daemon import request_artifact
+
+request_artifact(__file__)
+
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
 import os
 import mediacloud.api
 
-from util import cache
-from parties import party_search_terms
+from artifacts import publish
+from util import STATE_DIR, cache
+from parties import party_registry
 from tqdm import tqdm
 
 # Initialize MediaCloud API
@@ -12,23 +17,22 @@ MEDIACLOUD_API_TOKEN = os.getenv("MEDIACLOUD_API_TOKEN")
 search = mediacloud.api.SearchApi(MEDIACLOUD_API_TOKEN)
 directory = mediacloud.api.DirectoryApi(MEDIACLOUD_API_TOKEN)
 
+COUNTS_PATH = STATE_DIR / "media_counts.pkl"
+# Articles of the last days are still being indexed, so they are fetched again
+OVERLAP = timedelta(days=7)
+
 
 @cache
 def _story_count_over_time(**kwargs):
     return search.story_count_over_time(**kwargs)
 
 
-@cache
-def get_mediacloud_party_counts(start_date: date, end_date: date) -> pd.DataFrame:
-    """Get daily media counts for all parties from MediaCloud."""
+def fetch_party_counts(start_date: date, end_date: date) -> pd.DataFrame:
+    """Fetch daily media counts for all parties from MediaCloud."""
 
     all_counts = {}
 
-    for party, terms in tqdm(party_search_terms.items()):
-        # Build search query
-        search_terms = [party] + terms
-        query = " OR ".join(f'"{term}"' for term in search_terms)
-
+    for party, query in tqdm(party_registry.queries.items()):
         counts = _story_count_over_time(
             query=query,
             start_date=start_date,
@@ -64,6 +68,47 @@ def get_mediacloud_party_counts(start_date: date, end_date: date) -> pd.DataFram
     return pd.DataFrame()  # Return empty DataFrame if no data
 
 
+@cache
+def get_mediacloud_party_counts(start_date: date, end_date: date) -> pd.DataFrame:
+    """
+    Get daily media counts for all parties.
+    The counts are kept in `COUNTS_PATH`; only the days since the last stored day
+    (minus `OVERLAP`) are fetched and merged, unless the queries have changed or
+    the stored counts do not reach back to `start_date`.
+    """
+    stored = pd.read_pickle(COUNTS_PATH) if COUNTS_PATH.exists() else None
+    if (
+        stored is not None
+        and stored["queries"] == party_registry.queries
+        and stored["start_date"] <= start_date
+        and not stored["counts"].empty
+    ):
+        counts = stored["counts"]
+        fetch_start = max(start_date, counts["date"].max() - OVERLAP)
+        counts = counts[counts["date"] < fetch_start]
+        stored_start = stored["start_date"]
+    else:
+        counts, fetch_start, stored_start = pd.DataFrame(), start_date, start_date
+    new = fetch_party_counts(start_date=fetch_start, end_date=end_date)
+    counts = pd.concat([counts, new], ignore_index=True).fillna(0)
+    COUNTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    pd.to_pickle(
+        {
+            "queries": party_registry.queries,
+            "start_date": stored_start,
+            "counts": counts,
+        },
+        COUNTS_PATH,
+    )
+    if counts.empty:
+        return counts
+    return counts[(counts["date"] >= start_date) & (counts["date"] <= end_date)]
+
+
 if __name__ == "__main__":
-    df = get_mediacloud_party_counts(start_date=date(2020, 1, 1), end_date=date.today())
-    print(df.to_json(orient="records"))
+    publish(
+        __file__,
+        lambda: get_mediacloud_party_counts(
+            start_date=date(2020, 1, 1), end_date=date.today()
+        ),
+    )
@@ -1,3 +1,6 @@
+import re
+from typing import Iterable
+
 party_search_terms = {
     "SPD": ["Sozialdemokrat"],
     "CDU": ["Christdemokrat"],
@@ -41,3 +44,112 @@ party_search_terms = {
     # "die Basis": ["dieBasis"],
     # "ÖDP": ["Ökologisch-Demokratische"],
 }
+
+# TikTok hashtags per party, where they differ from the lowercased name without spaces
+party_hashtags = {
+    "Linke": ["dielinke"],
+}
+
+
+class PartyRegistry:
+    """
+    Everything needed to find parties in text, built once at import.
+    Each party has a bit in the `match` bitmasks, its search terms (the name and
+    its aliases), a MediaCloud query and its TikTok hashtags. All terms of all
+    parties are compiled into one case-insensitive trie regex, so matching a text
+    costs roughly the same no matter how many parties are enabled.
+    """
+
+    def __init__(
+        self, search_terms: dict[str, list[str]], hashtags: dict[str, list[str]]
+    ):
+        self.parties = list(search_terms)
+        self.bits = {party: 1 << i for i, party in enumerate(self.parties)}
+        self.terms = {party: [party] + terms for party, terms in search_terms.items()}
+        self.queries = {
+            party: " OR ".join(f'"{term}"' for term in terms)
+            for party, terms in self.terms.items()
+        }
+        self.hashtags = {
+            party: hashtags.get(party, [party.lower().replace(" ", "")])
+            for party in self.parties
+        }
+        term_bits = {}
+        for party, terms in self.terms.items():
+            for term in map(str.lower, terms):
+                term_bits[term] = term_bits.get(term, 0) | self.bits[party]
+        # A match also implies every term it contains (the regex reports one term per
+        # position, the longest)
+        self._term_bits = {
+            term: sum_bits(bits for other, bits in term_bits.items() if other in term)
+            for term in term_bits
+        }
+        # Zero-width lookahead, so that overlapping terms are found as well
+        self._pattern = re.compile(f"(?=({trie_pattern(term_bits)}))", re.IGNORECASE)
+
+    def match_one(self, text: str) -> int:
+        """
+        Bitmask of the parties mentioned in a text.
+
+        Case variants outside ASCII are matched like the regex matches them:
+
+        >>> registry = PartyRegistry({"SPD": [], "Linke": []}, {})
+        >>> registry.names(registry.match_one("LİNKE und lınke, CDU ſpd"))
+        ['SPD', 'Linke']
+        """
+        mask = 0
+        for match in self._pattern.finditer(text):
+            mask |= self._matched_bits(match.group(1))
+        return mask
+
+    def _matched_bits(self, matched: str) -> int:
+        bits = self._term_bits.get(matched.lower())
+        if bits is None:
+            # IGNORECASE also matches e.g. "İ", "ı" or "ſ", whose lowercase differs
+            # from the stored term, so compare the way the regex does
+            bits = sum_bits(
+                term_bits
+                for term, term_bits in self._term_bits.items()
+                if re.fullmatch(re.escape(term), matched, re.IGNORECASE)
+            )
+        return bits
+
+    def match(self, texts: Iterable[str]) -> list[int]:
+        """Bitmasks of the parties mentioned in each text."""
+        return [self.match_one(text) for text in texts]
+
+    def names(self, mask: int) -> list[str]:
+        """Decode a bitmask into party names."""
+        return [party for party, bit in self.bits.items() if mask & bit]
+
+
+def sum_bits(masks: Iterable[int]) -> int:
+    result = 0
+    for mask in masks:
+        result |= mask
+    return result
+
+
+def trie_pattern(terms: Iterable[str]) -> str:
+    """Regex matching any of the terms, with common prefixes factored out."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def pattern(node: dict) -> str:
+        branches = [
+            re.escape(char) + pattern(child) for char, child in node.items() if char
+        ]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Prefer the longer continuation, fall back to the term ending here
+        return f"(?:{group})?" if "" in node else group
+
+    return pattern(trie)
+
+
+party_registry = PartyRegistry(party_search_terms, party_hashtags)
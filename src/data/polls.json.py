@@ -1,28 +1,94 @@
-from datetime import date
-from requests import get
-from util import cache
+from daemon import request_artifact
+
+request_artifact(__file__)
+
+from typing import Any
+
+import requests
+from artifacts import publish
+from util import STATE_DIR, load_state, save_state
 
 import pandas as pd
 
+POLLS_URL = "https://interactive.zeit.de/g/cronjobs/wahltrend-2025/bund/polls.json"
+POLLS_PATH = STATE_DIR / "polls.pkl"
+# Define columns that remain unchanged (identifier columns)
+ID_VARS = ["date", "Period", "Poll_ID", "Pollster", "n"]
+PARTY_NAMES = {"CDUCSU": "CDU", "Gruene": "Grüne"}
+
 
-@cache
-def get_polls_dots(end_date: date) -> pd.DataFrame:
-    response = get("https://interactive.zeit.de/g/cronjobs/wahltrend-2025/bund/polls.json")
-    df = pd.DataFrame(response.json())
-    df = df.rename(columns={"Date": "date"})
-    # Define columns that remain unchanged (identifier columns)
-    id_vars = ['date', 'Period', 'Poll_ID', 'Pollster', 'n']
+def fetch_polls(
+    conditional: bool = True,
+) -> tuple[list[dict[str, Any]] | None, dict[str, str]]:
+    """
+    Fetch the poll feed, or None if it has not changed since the last fetch.
+    Also returns the feed's validators, to be saved as `polls_feed` once the polls
+    are stored.
+    """
+    feed = load_state("polls_feed") if conditional else {}
+    headers = {}
+    if "etag" in feed:
+        headers["If-None-Match"] = feed["etag"]
+    if "last_modified" in feed:
+        headers["If-Modified-Since"] = feed["last_modified"]
+    response = requests.get(POLLS_URL, headers=headers)
+    if response.status_code == 304:
+        return None, feed
+    response.raise_for_status()
+    feed = {
+        key: response.headers[header]
+        for key, header in [("etag", "ETag"), ("last_modified", "Last-Modified")]
+        if header in response.headers
+    }
+    return response.json(), feed
+
+
+def to_long(polls: list[dict[str, Any]]) -> pd.DataFrame:
+    """Convert polls to a typed long table, without rows for unreported parties."""
+    df = pd.DataFrame(polls).rename(columns={"Date": "date"} | PARTY_NAMES)
     # All other columns are assumed to be party results
-    party_cols = [col for col in df.columns if col not in id_vars]
-    
-    # Convert the wide dataframe to long format:
-    # Each row will have: Date, Period, Poll_ID, Pollster, n, party, value.
-    df_long = df.melt(id_vars=id_vars, value_vars=party_cols, 
-                      var_name='party', value_name='value')
-    df_long['party'] = df_long['party'].replace("CDUCSU", "CDU").replace("Gruene", "Grüne")
-    return df_long
+    party_cols = [col for col in df.columns if col not in ID_VARS]
+    df_long = df.melt(
+        id_vars=ID_VARS, value_vars=party_cols, var_name="party", value_name="value"
+    )
+    df_long["date"] = pd.to_datetime(df_long["date"])
+    df_long["n"] = pd.to_numeric(df_long["n"], errors="coerce")
+    df_long["value"] = pd.to_numeric(df_long["value"], errors="coerce")
+    return df_long.dropna(subset=["value"])
+
+
+def get_polls_dots() -> pd.DataFrame:
+    """
+    Get all polls in long format: one row per poll and reported party.
+    The history is kept in `POLLS_PATH`; only polls with new `Poll_ID`s are added.
+    """
+    stored = pd.read_pickle(POLLS_PATH) if POLLS_PATH.exists() else None
+    polls, feed = fetch_polls(conditional=stored is not None)
+    if polls is None:
+        return stored
+    if stored is not None:
+        known = set(stored["Poll_ID"])
+        polls = [poll for poll in polls if poll["Poll_ID"] not in known]
+        if not polls:
+            save_state("polls_feed", feed)
+            return stored
+    df = pd.concat([stored, to_long(polls)], ignore_index=True)
+    df = df.astype(
+        {
+            "Period": "category",
+            "Pollster": "category",
+            "n": "Int32",
+            "party": "category",
+            "value": "float64",
+        }
+    )
+    df = df.sort_values(["date", "Poll_ID", "party"], ignore_index=True)
+    POLLS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    df.to_pickle(POLLS_PATH)
+    # Only now, so that a failed run fetches the same polls again instead of a 304
+    save_state("polls_feed", feed)
+    return df
 
 
 if __name__ == "__main__":
-    df = get_polls_dots(date.today())
-    print(df.to_json(orient="records", date_format="iso"))
+    publish(__file__, get_polls_dots)
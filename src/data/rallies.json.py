@@ -1,29 +1,38 @@
+from daemon import request_artifact
+
+request_artifact(__file__)
+
+import json
+import numpy as np
 import pandas as pd
 import requests
-from datetime import date
+from datetime import date, timedelta
 import os
 import re
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Literal
 
-from parties import party_search_terms
-from util import cache
+from parties import party_registry
+from artifacts import publish
+from util import STATE_DIR, cache
 from number_parser import parse_number
 
 # Environment variables should be set for these
 ACLED_EMAIL = os.getenv("ACLED_EMAIL")
 ACLED_KEY = os.getenv("ACLED_KEY")
 
+EVENTS_PATH = STATE_DIR / "acled_events.pkl"
+NOTES_DIR = STATE_DIR / "acled_notes"
+# ACLED revises the events of the last weeks, so they are fetched again
+OVERLAP = timedelta(weeks=4)
 
-def get_acled_events(
-    end_date: date,
-    start_date: date = date(2020, 1, 1),
-    countries: list[str] = ["Germany"],
-) -> pd.DataFrame:
-    """Fetch protests from the ACLED API focusing on German political parties."""
 
+def acled_parameters(
+    start_date: date, end_date: date, countries: list[str]
+) -> dict[str, str | int]:
     assert start_date >= date(2020, 1, 1), "Start date must be after 2020-01-01"
-
-    # API parameters
-    parameters = {
+    return {
         "email": ACLED_EMAIL,
         "key": ACLED_KEY,
         "event_type": "Protests",
@@ -34,11 +43,62 @@ def get_acled_events(
         "limit": 1_000_000,
     }
 
-    # Make API request
+
+def fetch_acled_rows(
+    start_date: date, end_date: date, countries: list[str]
+) -> pd.DataFrame:
+    """Fetch the raw protest rows from the ACLED API."""
+    parameters = acled_parameters(start_date, end_date, countries)
     response = cache(requests.get)(
         "https://api.acleddata.com/acled/read", params=parameters
     )
-    df = pd.DataFrame(response.json()["data"])
+    return pd.DataFrame(response.json()["data"])
+
+
+def get_acled_rows(
+    start_date: date, end_date: date, countries: list[str]
+) -> pd.DataFrame:
+    """
+    Get the raw protest rows, kept in `EVENTS_PATH`.
+    Only events since the last stored event date (minus `OVERLAP`, as ACLED revises
+    recent weeks) are fetched and merged, unless the stored rows are for other
+    countries or do not reach back to `start_date`.
+    """
+    stored = pd.read_pickle(EVENTS_PATH) if EVENTS_PATH.exists() else None
+    if (
+        stored is not None
+        and stored["countries"] == countries
+        and stored["start_date"] <= start_date
+        and not stored["rows"].empty
+    ):
+        rows = stored["rows"]
+        last_date = pd.to_datetime(rows["event_date"]).max().date()
+        fetch_start = max(start_date, last_date - OVERLAP)
+        rows = rows[pd.to_datetime(rows["event_date"]).dt.date < fetch_start]
+        stored_start = stored["start_date"]
+    else:
+        rows, fetch_start, stored_start = pd.DataFrame(), start_date, start_date
+    new = fetch_acled_rows(fetch_start, end_date, countries)
+    rows = pd.concat([rows, new], ignore_index=True)
+    EVENTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    pd.to_pickle(
+        {"countries": countries, "start_date": stored_start, "rows": rows},
+        EVENTS_PATH,
+    )
+    if rows.empty:
+        return rows
+    dates = pd.to_datetime(rows["event_date"]).dt.date
+    return rows[(dates >= start_date) & (dates <= end_date)].reset_index(drop=True)
+
+
+def get_acled_events(
+    end_date: date,
+    start_date: date = date(2020, 1, 1),
+    countries: list[str] = ["Germany"],
+) -> pd.DataFrame:
+    """Fetch protests from the ACLED API focusing on German political parties."""
+
+    df = get_acled_rows(start_date, end_date, countries)
 
     if df.empty:
         return df
@@ -66,36 +126,107 @@ def get_acled_events(
     ]
 
 
+def get_acled_events_typed(
+    end_date: date,
+    start_date: date = date(2020, 1, 1),
+    countries: list[str] = ["Germany"],
+    chunk_size: int = 5_000,
+    text: Literal["keep", "drop", "offload"] = "drop",
+) -> pd.DataFrame:
+    """
+    Low-memory variant of `get_acled_events`.
+    Events are fetched and processed page by page. Strings with few distinct values
+    are categorical, `parties` is a `party_registry` bitmask instead of a list, and
+    the free-text description is kept, dropped, or offloaded to the query's file in
+    `NOTES_DIR` (one JSON string per line, referenced by `description_id`; the path
+    is in `df.attrs["notes_path"]`).
+    """
+    parameters = acled_parameters(start_date, end_date, countries)
+    parameters["limit"] = chunk_size
+    path = notes_path(start_date, end_date, countries)
+    if text == "offload":
+        path.parent.mkdir(parents=True, exist_ok=True)
+    n_notes = 0
+    chunks = []
+    page = 1
+    with open(path, "w") if text == "offload" else nullcontext() as notes_file:
+        while True:
+            response = cache(requests.get)(
+                "https://api.acleddata.com/acled/read",
+                params=parameters | {"page": page},
+            )
+            data = response.json()["data"]
+            if not data:
+                break
+            df = process_orgs(pd.DataFrame(data))
+            chunk = pd.DataFrame(
+                {
+                    "date": pd.to_datetime(df["event_date"]),
+                    "event_type": df["sub_event_type"].astype("category"),
+                    "country": df["country"].astype("category"),
+                    "region": df["admin1"].astype("category"),
+                    "city": df["admin2"].astype("category"),
+                    "parties": df["parties"],
+                    # Nearly unique per event, so not worth a category
+                    "organizers": df["organizers"].astype("string"),
+                    "size": pd.array(df["tags"].apply(get_size), dtype="Int32"),
+                }
+            )
+            if text == "keep":
+                chunk["description"] = df["notes"].astype("string")
+            elif text == "offload":
+                chunk["description_id"] = np.arange(
+                    n_notes, n_notes + len(df), dtype=np.int32
+                )
+                notes_file.writelines(json.dumps(note) + "\n" for note in df["notes"])
+                n_notes += len(df)
+            chunks.append(chunk)
+            if len(data) < chunk_size:
+                break
+            page += 1
+
+    if not chunks:
+        return pd.DataFrame()
+    # Concatenate without falling back to object dtype for differing categories
+    df = pd.DataFrame(
+        {
+            column: (
+                pd.api.types.union_categoricals([chunk[column] for chunk in chunks])
+                if isinstance(chunks[0][column].dtype, pd.CategoricalDtype)
+                else pd.concat([chunk[column] for chunk in chunks], ignore_index=True)
+            )
+            for column in chunks[0].columns
+        }
+    )
+    df["parties"] = df["parties"].astype(_bitmask_dtype())
+    if text == "offload":
+        df.attrs["notes_path"] = str(path)
+    return df
+
+
+def notes_path(start_date: date, end_date: date, countries: list[str]) -> Path:
+    """File for the offloaded descriptions of one query."""
+    return NOTES_DIR / f"{start_date}_{end_date}_{'-'.join(countries)}.jsonl"
+
+
+def _bitmask_dtype() -> type[np.unsignedinteger]:
+    """Smallest unsigned integer type with one bit per party."""
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if len(party_registry.parties) <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError("Too many parties for a 64-bit mask")
+
+
 def process_orgs(df: pd.DataFrame) -> pd.DataFrame:
     """Process organization names in the dataset."""
     df = df.rename(columns={"assoc_actor_1": "organizers"})
 
-    # Create a mapping from search terms to canonical names
-    term_to_party = {}
-    for party, terms in party_search_terms.items():
-        term_to_party[party.lower()] = party  # Add the party name itself
-        for term in terms:
-            term_to_party[term.lower()] = party
-
-    df["organizers_canonical"] = (
-        df["organizers"]
-        .str.split("; ")
-        .apply(lambda x: [] if x == [""] else x)
-        # Remove country-specific suffixes
-        .apply(lambda x: [re.sub(r" \(.+\)$", "", org) for org in x])
-        # Map to canonical party names
-        .apply(
-            lambda x: [
-                party
-                for org in x
-                for term, party in term_to_party.items()
-                if term in org.lower()
-            ]
-        )
-        .apply(lambda x: list(set(x)))  # Remove duplicates
-    )
-    # Remove empty lists
-    df = df[df["organizers_canonical"].apply(lambda x: len(x) > 0)]
+    # Remove country-specific suffixes of each organizer
+    organizers = df["organizers"].str.replace(r" \([^;]+\)(?=; |$)", "", regex=True)
+    # Map to party bitmasks and canonical party names
+    df["parties"] = party_registry.match(organizers)
+    df = df[df["parties"] > 0].copy()
+    df["organizers_canonical"] = df["parties"].apply(party_registry.names)
     return df
 
 
@@ -183,5 +314,7 @@ def get_size(size_text: str) -> int | None:
 
 
 if __name__ == "__main__":
-    df = get_acled_events(start_date=date(2020, 1, 1), end_date=date.today())
-    print(df.to_json(orient="records", date_format="iso"))
+    publish(
+        __file__,
+        lambda: get_acled_events(start_date=date(2020, 1, 1), end_date=date.today()),
+    )
@@ -0,0 +1,14 @@
+from daemon import request_artifact
+
+request_artifact(__file__)
+
+from datetime import date
+
+from artifacts import publish
+from rally_cube import to_columns, update_cube
+from util import import_loader
+
+if __name__ == "__main__":
+    rallies = import_loader("rallies.json.py")
+    events = rallies.get_acled_events(start_date=date(2020, 1, 1), end_date=date.today())
+    publish(__file__, lambda: to_columns(update_cube(events)))
@@ -0,0 +1,91 @@
+"""
+Region × party × week cube of rallies.
+
+`get_acled_events` returns one row per event with a list of organizing parties,
+so every regional or per-party view would have to explode and group it on the
+client. The cube holds the aggregates per `region` (admin1), party and ISO week.
+It is persisted in `.cache/state/` together with a fingerprint of each week's
+events, so an update only recomputes the weeks whose events changed.
+"""
+
+import pandas as pd
+from util import STATE_DIR
+
+CUBE_PATH = STATE_DIR / "rally_cube.pkl"
+KEY = ["region", "party", "week"]
+
+
+def iso_weeks(dates: pd.Series) -> pd.Series:
+    """Format dates as ISO weeks, e.g. `2025-W03`."""
+    iso = pd.to_datetime(dates).dt.isocalendar()
+    return iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+
+
+def week_fingerprints(events: pd.DataFrame) -> pd.Series:
+    """
+    Order-independent hash of the events in each ISO week.
+    The canonical parties are included, so a changed party mapping is picked up.
+    """
+    columns = ["date", "region", "organizers", "organizers_canonical", "size"]
+    rows = events[columns].astype(str)
+    hashes = pd.util.hash_pandas_object(rows, index=False)
+    return hashes.groupby(iso_weeks(events["date"]).to_numpy()).sum()
+
+
+def build_cube(events: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate events per region, party and ISO week in one vectorized pass."""
+    df = pd.DataFrame(
+        {
+            "region": events["region"],
+            "party": events["organizers_canonical"],
+            "week": iso_weeks(events["date"]),
+            "size": pd.to_numeric(events["size"], errors="coerce"),
+        }
+    ).explode("party")
+    cube = df.groupby(KEY)["size"].agg(
+        events="size", size_sum="sum", size_median="median", size_known="count"
+    )
+    cube["size_known"] = cube["size_known"] / cube["events"]
+    return cube.reset_index()
+
+
+def update_cube(events: pd.DataFrame) -> pd.DataFrame:
+    """Update the persisted cube, recomputing only weeks whose events changed."""
+    fingerprints = week_fingerprints(events)
+    if CUBE_PATH.exists():
+        state = pd.read_pickle(CUBE_PATH)
+        old_fingerprints, cube = state["fingerprints"], state["cube"]
+    else:
+        old_fingerprints, cube = pd.Series(dtype="uint64"), build_cube(events.iloc[:0])
+
+    unchanged = fingerprints[
+        fingerprints.eq(old_fingerprints.reindex(fingerprints.index))
+    ].index
+    changed = fingerprints.index.difference(unchanged)
+    cube = pd.concat(
+        [
+            cube[cube["week"].isin(unchanged)],
+            build_cube(events[iso_weeks(events["date"]).isin(changed).to_numpy()]),
+        ],
+        ignore_index=True,
+    ).sort_values(KEY, ignore_index=True)
+
+    CUBE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    pd.to_pickle({"fingerprints": fingerprints, "cube": cube}, CUBE_PATH)
+    return cube
+
+
+def to_columns(cube: pd.DataFrame) -> dict:
+    """Encode the cube as compact columns, with the keys as indices into lookups."""
+    columns = {}
+    for key, lookup in zip(KEY, ["regions", "parties", "weeks"]):
+        codes, uniques = pd.factorize(cube[key], sort=True)
+        columns[lookup] = uniques.tolist()
+        columns[key] = codes.tolist()
+    columns["events"] = cube["events"].tolist()
+    columns["size_sum"] = cube["size_sum"].round().astype(int).tolist()
+    columns["size_median"] = [
+        None if pd.isna(size) else float(size) for size in cube["size_median"]
+    ]
+    columns["size_known"] = cube["size_known"].round(3).tolist()
+    return columns
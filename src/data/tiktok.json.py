@@ -1,3 +1,7 @@
+from daemon import request_artifact
+
+request_artifact(__file__)
+
 import os
 import re
 from collections import Counter
@@ -7,6 +11,9 @@ from typing import Any
 import pandas as pd
 import requests
 from tqdm.auto import tqdm
+from tiktok_crawl import crawl_comments, crawl_hashtag
+from tiktok_records import interning
+from artifacts import publish
 from util import cache
 
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
@@ -52,45 +59,6 @@ def get_hashtag_suggestions(keywords: str) -> Counter:
     return hashtag_counts
 
 
-def get_hashtag_id(hashtag: str) -> str:
-    url = "https://tiktok-scraper7.p.rapidapi.com/challenge/info"
-    querystring = {
-        "challenge_name": hashtag,
-    }
-    response = get(url, headers=headers, params=querystring)
-    return response.json()["data"]["id"]
-
-
-def get_videos_for_hashtag_id(
-    hashtag_id: str, n: int, cursor: int = 0, verbose: bool = True
-) -> list[dict[str, Any]]:
-    url = "https://tiktok-scraper7.p.rapidapi.com/challenge/posts"
-    query = {
-        "challenge_id": hashtag_id,
-        "count": 20,  # max: 20
-        "cursor": cursor,
-    }
-    response = get(url, headers=headers, params=query)
-    data = response.json()["data"]
-    videos, cursor, has_more = data["videos"], data["cursor"], data["hasMore"]
-    if has_more and cursor < n:
-        if verbose:
-            print(cursor)
-        videos.extend(
-            get_videos_for_hashtag_id(
-                hashtag_id=hashtag_id, n=n, cursor=cursor, verbose=verbose
-            )
-        )
-    return videos
-
-
-def get_videos_for_hashtag(
-    hashtag: str, n: int, cursor: int = 0, verbose: bool = True
-) -> list[dict[str, Any]]:
-    hashtag_id = get_hashtag_id(hashtag)
-    return get_videos_for_hashtag_id(hashtag_id, n=n, cursor=cursor, verbose=verbose)
-
-
 def get_video_history_for_hashtag(
     hashtag: str, n: int, verbose: bool = True
 ) -> pd.DataFrame:
@@ -99,13 +67,18 @@ def get_video_history_for_hashtag(
     Returns a time series of views and posts.
     Views are computed by summing the views of all videos that were posted in a given day -- that is, the views do not correspond to the dates when the videos were actually viewed. It is recommended to just use posts, or comments (see `get_comment_history_for_hashtag`).
     """
-    videos = get_videos_for_hashtag(hashtag, n=n, verbose=verbose)
+    videos = crawl_hashtag(hashtag, n=n, verbose=verbose)
+    if not videos:
+        # e.g. a hashtag that has not been crawled yet
+        return pd.DataFrame(
+            {"views": [], "posts": []}, index=pd.DatetimeIndex([]), dtype=float
+        )
     df = pd.DataFrame(
         {
-            "date": [datetime.fromtimestamp(video["create_time"]) for video in videos],
-            "id": [video["video_id"] for video in videos],
-            "title": [video["title"] for video in videos],
-            "views": [video["play_count"] for video in videos],
+            "date": [datetime.fromtimestamp(video.create_time) for video in videos],
+            "id": [video.video_id for video in videos],
+            "title": [video.title for video in videos],
+            "views": [video.play_count for video in videos],
         }
     )
     df["date"] = pd.to_datetime(df["date"])
@@ -124,40 +97,18 @@ def get_video_history_for_hashtag(
     return ts
 
 
-def get_comments_for_video(
-    video_id: str, n: int, cursor: int = 0
-) -> list[dict[str, Any]]:
-    url = "https://tiktok-scraper7.p.rapidapi.com/comment/list"
-    query = {
-        "url": video_id,
-        "count": 50,  # max: 50 (?)
-        "cursor": cursor,
-    }
-    response = get(url, headers=headers, params=query)
-    data = response.json()["data"]
-    comments, cursor, has_more = data["comments"], data["cursor"], data["hasMore"]
-    if has_more and cursor < n:
-        comments.extend(get_comments_for_video(video_id, n=n, cursor=cursor))
-    return comments
-
-
 def get_comment_history_for_hashtag(
     hashtag: str, n_posts: int, n_comments: int, verbose: bool = True
 ) -> pd.DataFrame:
-    videos = get_videos_for_hashtag(hashtag, n=n_posts, verbose=verbose)
-    comments = [
-        get_comments_for_video(video["video_id"], n=n_comments)
-        for video in tqdm(videos)
-        if video["comment_count"] > 0
-    ]
-    comments = [comment for video_comments in comments for comment in video_comments]
+    videos = crawl_hashtag(hashtag, n=n_posts, verbose=verbose)
+    comments = crawl_comments(hashtag, videos, n=n_comments)
     comments_df = pd.DataFrame(
         {
             "date": [
-                datetime.fromtimestamp(comment["create_time"]) for comment in comments
+                datetime.fromtimestamp(comment.create_time) for comment in comments
             ],
-            "text": [comment["text"] for comment in comments],
-            "video_id": [comment["video_id"] for comment in comments],
+            "text": [comment.text for comment in comments],
+            "video_id": [comment.video_id for comment in comments],
         }
     )
     ts = (
@@ -173,18 +124,19 @@ def get_comment_history_for_hashtag(
     return ts
 
 
+@interning()
 def get_tiktok_party_counts(
     start_date: date, end_date: date, verbose: bool
 ) -> pd.DataFrame:
     """Get weekly TikTok comment counts for all parties using their most popular hashtags."""
-    from parties import party_search_terms
+    from parties import party_registry
 
     all_counts = {}
 
     # Step 1: Get and print hashtag suggestions for each party
-    for party, terms in tqdm(party_search_terms.items()):
+    for party, hashtags in tqdm(party_registry.hashtags.items()):
         video_ts = get_video_history_for_hashtag(
-            hashtag=party.replace(" ", ""),
+            hashtag=hashtags[0],
             n=50,  # Adjust these numbers as needed (up to 1000(?))
             verbose=verbose,
         )
@@ -202,7 +154,9 @@ def get_tiktok_party_counts(
 
 
 if __name__ == "__main__":
-    df = get_tiktok_party_counts(
-        start_date=date(2020, 1, 1), end_date=date.today(), verbose=False
+    publish(
+        __file__,
+        lambda: get_tiktok_party_counts(
+            start_date=date(2020, 1, 1), end_date=date.today(), verbose=False
+        ),
     )
-    print(df.to_json(orient="records", date_format="iso"))
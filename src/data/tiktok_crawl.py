@@ -0,0 +1,148 @@
+"""
+Incremental TikTok crawling.
+
+Walking `challenge/posts` and `comment/list` from cursor 0 on every run costs the
+same number of requests however little has changed. The functions here persist
+per-hashtag and per-video checkpoints in `.cache/state/tiktok/` and stop
+paginating as soon as they reach content that is already known, so API usage
+scales with new activity. Both feeds are assumed to list the newest items first.
+"""
+
+import os
+from datetime import date
+from typing import Any
+
+import requests
+from tiktok_records import Comment, Video
+from tqdm.auto import tqdm
+from util import cache, load_state, save_state, state_lock
+
+RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
+RAPIDAPI_BASE_URL = "https://tiktok-scraper7.p.rapidapi.com"
+HEADERS = {
+    "x-rapidapi-key": RAPIDAPI_KEY,
+    "x-rapidapi-host": "tiktok-scraper7.p.rapidapi.com",
+}
+
+
+def fetch_page(endpoint: str, params: dict[str, Any]) -> dict[str, Any]:
+    """Make an uncached request to the TikTok API (pages change between crawls)."""
+    url = f"{RAPIDAPI_BASE_URL}/{endpoint}"
+    response = requests.get(url, headers=HEADERS, params=params)
+    return response.json()["data"]
+
+
+@cache
+def get_hashtag_id(hashtag: str) -> str:
+    return fetch_page("challenge/info", {"challenge_name": hashtag})["id"]
+
+
+def crawl_hashtag(hashtag: str, n: int, verbose: bool = True) -> list[Video]:
+    """
+    Get the (up to) `n` most recent videos for a hashtag.
+    This assumes that `challenge/posts` lists the newest videos first: pages are
+    fetched from the top of the feed until a page contains no unknown video. Once a
+    day the feed is walked down to the deepest `n` requested so far instead, which
+    refreshes the metrics of all kept videos for the daily snapshots.
+    """
+    state_name = f"tiktok/hashtag_{hashtag}"
+    # The TikTok loaders may crawl the same hashtag at the same time
+    with state_lock(state_name):
+        state = load_state(state_name)
+        known = {
+            video_id: Video.from_api(video)
+            for video_id, video in state.get("videos", {}).items()
+        }
+        hashtag_id = state.get("hashtag_id") or get_hashtag_id(hashtag)
+        # The loaders crawl the same hashtag with different n, keep enough for all
+        depth = max(n, state.get("depth", 0))
+        today = date.today().isoformat()
+        full_walk = state.get("depth", 0) < n or state.get("refreshed") != today
+
+        cursor = 0
+        while True:
+            data = fetch_page(
+                "challenge/posts",
+                {"challenge_id": hashtag_id, "count": 20, "cursor": cursor},  # max: 20
+            )
+            page = [Video.from_api(video) for video in data["videos"]]
+            new = [video for video in page if video.video_id not in known]
+            for video in page:
+                known[video.video_id] = video
+            # Everything on this page is known, so the rest of the feed is too
+            if not page or not (full_walk or new):
+                break
+            cursor, has_more = data["cursor"], data["hasMore"]
+            if not has_more or cursor >= depth:
+                break
+            if verbose:
+                print(cursor)
+
+        videos = sorted(known.values(), key=lambda x: x.create_time, reverse=True)
+        videos = videos[:depth]
+        if videos:
+            latest = videos[0]
+            state = {
+                "hashtag_id": hashtag_id,
+                "depth": depth,
+                "refreshed": today if full_walk else state.get("refreshed"),
+                "last_video_id": latest.video_id,
+                "last_create_time": latest.create_time,
+                "videos": {video.video_id: video.to_dict() for video in videos},
+            }
+            save_state(state_name, state)
+        return videos[:n]
+
+
+def crawl_comments(hashtag: str, videos: list[Video], n: int) -> list[Comment]:
+    """
+    Get (up to) `n` comments per video, plus the new ones since the last crawl.
+    This assumes that `comment/list` lists the newest comments first: videos whose
+    `comment_count` has grown are read from the top until a known comment shows up,
+    and videos whose `comment_count` has not grown are not requested.
+    """
+    state_name = f"tiktok/comments_{hashtag}"
+    # The TikTok loaders may crawl the same hashtag at the same time
+    with state_lock(state_name):
+        state = load_state(state_name)
+
+        for video in tqdm(videos):
+            video_id = video.video_id
+            checkpoint = state.get(video_id, {"comment_count": 0, "comments": []})
+            if video.comment_count <= checkpoint["comment_count"]:
+                continue
+            seen = {comment["cid"] for comment in checkpoint["comments"]}
+            # On later crawls, read about as far as the comment count has grown
+            limit = video.comment_count - checkpoint["comment_count"] if seen else n
+            new = []
+            cursor = 0
+            while cursor < limit:
+                data = fetch_page(
+                    "comment/list", {"url": video_id, "count": 50, "cursor": cursor}
+                )
+                page = [Comment.from_api(comment) for comment in data["comments"]]
+                reached_known = any(comment.cid in seen for comment in page)
+                new.extend(
+                    comment.to_dict() for comment in page if comment.cid not in seen
+                )
+                if reached_known or not data["hasMore"]:
+                    break
+                cursor = data["cursor"]
+            checkpoint = {
+                "comment_count": video.comment_count,
+                "comments": new + checkpoint["comments"],
+            }
+            state[video_id] = checkpoint
+
+        # Only keep checkpoints for videos that are still part of the crawl
+        state = {
+            video.video_id: state[video.video_id]
+            for video in videos
+            if video.video_id in state
+        }
+        save_state(state_name, state)
+        return [
+            Comment.from_api(comment)
+            for checkpoint in state.values()
+            for comment in checkpoint["comments"]
+        ]
@@ -1,4 +1,7 @@
-import json
+from daemon import request_artifact
+
+request_artifact(__file__)
+
 import os
 import re
 import sys
@@ -10,6 +13,10 @@ from math import log
 import pandas as pd
 import requests
 from tqdm.auto import tqdm
+from tiktok_crawl import crawl_comments, crawl_hashtag
+from tiktok_records import Video, hashtag_names, interning
+from tiktok_snapshots import get_view_velocity, record_snapshots
+from artifacts import publish
 from util import cache
 
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
@@ -33,15 +40,15 @@ def extract_hashtags(text: str) -> List[str]:
     """Extract hashtags from text."""
     return re.findall(r"#(\w+)", text)
 
-def create_empty_account_stats(video: Dict[str, Any]) -> Dict[str, Any]:
+def create_empty_account_stats(video: Video) -> Dict[str, Any]:
     """Create initial account statistics structure."""
     return {
         'videos': 0,
         'total_plays': 0,
         'total_likes': 0,
         'total_comments': 0,
-        'avatar': video['author']['avatar'],
-        'nickname': video['author']['nickname']
+        'avatar': video.author.avatar,
+        'nickname': video.author.nickname
     }
 
 def calculate_engagement_score(stats: Dict[str, Any]) -> float:
@@ -80,44 +87,14 @@ def get_hashtag_suggestions(keywords: str) -> Counter:
     hashtags = [item for sublist in hashtags for item in sublist]
     return Counter(hashtags)
 
-def get_hashtag_id(hashtag: str) -> str:
-    data = make_api_request("challenge/info", {"challenge_name": hashtag})
-    return data["id"]
-
-def get_videos_for_hashtag_id(
-    hashtag_id: str, n: int, cursor: int = 0, verbose: bool = True
-) -> list[dict[str, Any]]:
-    query = {
-        "challenge_id": hashtag_id,
-        "count": 20,  # max: 20
-        "cursor": cursor,
-    }
-    data = make_api_request("challenge/posts", query)
-    videos, cursor, has_more = data["videos"], data["cursor"], data["hasMore"]
-    if has_more and cursor < n:
-        if verbose:
-            print(cursor)
-        videos.extend(
-            get_videos_for_hashtag_id(
-                hashtag_id=hashtag_id, n=n, cursor=cursor, verbose=verbose
-            )
-        )
-    return videos
-
-def get_videos_for_hashtag(
-    hashtag: str, n: int, cursor: int = 0, verbose: bool = True
-) -> list[dict[str, Any]]:
-    hashtag_id = get_hashtag_id(hashtag)
-    return get_videos_for_hashtag_id(hashtag_id, n=n, cursor=cursor, verbose=verbose)
-
-def process_video_data(videos: List[Dict[str, Any]]) -> pd.DataFrame:
+def process_video_data(videos: List[Video]) -> pd.DataFrame:
     """Process video data into a DataFrame with common transformations."""
     df = pd.DataFrame(
         {
-            "date": [datetime.fromtimestamp(video["create_time"]) for video in videos],
-            "id": [video["video_id"] for video in videos],
-            "title": [video["title"] for video in videos],
-            "views": [video["play_count"] for video in videos],
+            "date": [datetime.fromtimestamp(video.create_time) for video in videos],
+            "id": [video.video_id for video in videos],
+            "title": [video.title for video in videos],
+            "views": [video.play_count for video in videos],
         }
     )
     df["date"] = pd.to_datetime(df["date"])
@@ -131,7 +108,7 @@ def get_video_history_for_hashtag(
     Returns a time series of views and posts.
     Views are computed by summing the views of all videos that were posted in a given day.
     """
-    videos = get_videos_for_hashtag(hashtag, n=n, verbose=verbose)
+    videos = crawl_hashtag(hashtag, n=n, verbose=verbose)
     df = process_video_data(videos)
     ts = (
         df.resample("1D", on="date")
@@ -144,36 +121,17 @@ def get_video_history_for_hashtag(
     ts = ts[ts.index < pd.Timestamp.now()]
     return ts.reindex(pd.date_range(start=ts.index.min(), end=ts.index.max())).fillna(0)
 
-def get_comments_for_video(
-    video_id: str, n: int, cursor: int = 0
-) -> list[dict[str, Any]]:
-    query = {
-        "url": video_id,
-        "count": 50,  # max: 50 (?)
-        "cursor": cursor,
-    }
-    data = make_api_request("comment/list", query)
-    comments, cursor, has_more = data["comments"], data["cursor"], data["hasMore"]
-    if has_more and cursor < n:
-        comments.extend(get_comments_for_video(video_id, n=n, cursor=cursor))
-    return comments
-
 def get_comment_history_for_hashtag(
     hashtag: str, n_posts: int, n_comments: int, verbose: bool = True
 ) -> pd.DataFrame:
-    videos = get_videos_for_hashtag(hashtag, n=n_posts, verbose=verbose)
-    comments = [
-        get_comments_for_video(video["video_id"], n=n_comments)
-        for video in tqdm(videos)
-        if video["comment_count"] > 0
-    ]
-    comments = [comment for video_comments in comments for comment in video_comments]
+    videos = crawl_hashtag(hashtag, n=n_posts, verbose=verbose)
+    comments = crawl_comments(hashtag, videos, n=n_comments)
     
     df = pd.DataFrame(
         {
-            "date": [datetime.fromtimestamp(comment["create_time"]) for comment in comments],
-            "text": [comment["text"] for comment in comments],
-            "video_id": [comment["video_id"] for comment in comments],
+            "date": [datetime.fromtimestamp(comment.create_time) for comment in comments],
+            "text": [comment.text for comment in comments],
+            "video_id": [comment.video_id for comment in comments],
         }
     )
     
@@ -188,25 +146,23 @@ def get_comment_history_for_hashtag(
     )
     return ts.reindex(pd.date_range(start=ts.index.min(), end=ts.index.max())).fillna(0)
 
-def process_party_videos(videos: List[Dict[str, Any]]) -> tuple[Counter, Dict[str, Dict[str, Any]]]:
-    """Process videos to extract hashtag counts and account statistics."""
+def process_party_videos(videos: List[Video]) -> tuple[Counter, Dict[str, Dict[str, Any]]]:
+    """Process videos to extract hashtag (id) counts and account statistics."""
     hashtag_counts = Counter()
     account_stats = {}
     
     for video in videos:
-        video["url"] = f"https://www.tiktok.com/@{video['author']['unique_id']}/video/{video['video_id']}"
-        hashtags = extract_hashtags(video["title"])
-        hashtag_counts.update(hashtags)
+        hashtag_counts.update(video.hashtags)
         
-        author = video['author']['unique_id']
+        author = video.author.unique_id
         if author not in account_stats:
             account_stats[author] = create_empty_account_stats(video)
             
         stats = account_stats[author]
         stats['videos'] += 1
-        stats['total_plays'] += video['play_count']
-        stats['total_likes'] += video['digg_count']
-        stats['total_comments'] += video['comment_count']
+        stats['total_plays'] += video.play_count
+        stats['total_likes'] += video.digg_count
+        stats['total_comments'] += video.comment_count
     
     return hashtag_counts, account_stats
 
@@ -219,7 +175,7 @@ def calculate_hashtag_scores(
     """Calculate TF-IDF inspired scores for hashtags."""
     return [
         {
-            "tag": tag,
+            "tag": hashtag_names[tag],
             "count": count,
             "score": (count / total_hashtags) * log(num_parties / party_freq[tag]) * count
         }
@@ -254,46 +210,40 @@ def get_top_accounts(account_stats: Dict[str, Dict[str, Any]], min_videos: int =
         "score": 0
     }]
 
-def calculate_party_overall_stats(videos: List[Dict[str, Any]]) -> Dict[str, int]:
+def calculate_party_overall_stats(videos: List[Video]) -> Dict[str, int]:
     """Calculate overall statistics for a party's videos from the last 30 days."""
     # Get current timestamp and timestamp from 30 days ago
     current_time = int(datetime.now().timestamp())
     thirty_days_ago = current_time - (30 * 24 * 60 * 60)
     
     # Filter videos from last 30 days
-    recent_videos = [video for video in videos if video["create_time"] >= thirty_days_ago]
+    recent_videos = [video for video in videos if video.create_time >= thirty_days_ago]
     
     return {
-        "total_views": sum(video["play_count"] for video in recent_videos),
-        "total_likes": sum(video["digg_count"] for video in recent_videos),
-        "total_comments": sum(video["comment_count"] for video in recent_videos),
+        "total_views": sum(video.play_count for video in recent_videos),
+        "total_likes": sum(video.digg_count for video in recent_videos),
+        "total_comments": sum(video.comment_count for video in recent_videos),
         "total_videos": len(recent_videos),
-        "total_shares": sum(video["share_count"] for video in recent_videos)
+        "total_shares": sum(video.share_count for video in recent_videos)
     }
 
-def video_mentions_party(video: Dict[str, Any], party: str, terms: List[str]) -> bool:
-    """Check if a video mentions the party name or any of its associated terms in its title."""
-    title_lower = video["title"].lower()
-    # Check if either the party name or any of its associated terms are in the title
-    return any(term.lower() in title_lower for term in [party] + terms)
-
+@interning()
 def get_tiktok_party_counts() -> Dict[str, Any]:
     """Get weekly TikTok comment counts for all parties using their most popular hashtags."""
-    from parties import party_search_terms
+    from parties import party_registry
 
     party_hashtags = {}
     party_accounts = {}
     party_videos = {}  # Store videos for each party
     party_timelines = {}  # Store comment history for each party
+    crawled = {}  # Crawled videos for the metric snapshots
     all_hashtags = set()
     
     # First pass: collect hashtags and account stats
-    for party, terms in tqdm(party_search_terms.items()):
+    for party, hashtags in tqdm(party_registry.hashtags.items()):
         # Get videos and comments for party hashtag
+        hashtag = hashtags[0]
         try:
-            hashtag = party.lower().replace(" ", "")
-            if party == "Linke":
-                hashtag = "dielinke"
             video_history = get_video_history_for_hashtag(
                 hashtag, 
                 n=500,
@@ -310,18 +260,18 @@ def get_tiktok_party_counts() -> Dict[str, Any]:
                 'hashtag': ''
             }
 
-        videos = get_videos_for_hashtag(hashtag, n=500, verbose=False)
+        videos = crawl_hashtag(hashtag, n=500, verbose=False)
+        crawled[party] = videos
         # Filter videos to only include those that mention the party or its terms
-        videos = [video for video in videos if video_mentions_party(video, party, terms)]
+        mentions = party_registry.match(video.title for video in videos)
+        bit = party_registry.bits[party]
+        videos = [video for video, mask in zip(videos, mentions) if mask & bit]
         # filter videos by last 30 days
         current_time = int(datetime.now().timestamp())
         thirty_days_ago = current_time - (30 * 24 * 60 * 60)
-        videos = [video for video in videos if video["create_time"] >= thirty_days_ago]
+        videos = [video for video in videos if video.create_time >= thirty_days_ago]
         # sort videos by play_count
-        videos = sorted(videos, key=lambda x: x["play_count"], reverse=True)
-        # Process videos and store them
-        for video in videos:
-            video["url"] = f"https://www.tiktok.com/@{video['author']['unique_id']}/video/{video['video_id']}"
+        videos = sorted(videos, key=lambda x: x.play_count, reverse=True)
         party_videos[party] = videos
         hashtag_counts, account_stats = process_party_videos(videos)
         
@@ -334,9 +284,13 @@ def get_tiktok_party_counts() -> Dict[str, Any]:
     for hashtags in party_hashtags.values():
         hashtag_party_freq.update(hashtags.keys())
     
+    # Views per day between crawls, from the metric snapshots
+    record_snapshots(crawled)
+    view_velocity = get_view_velocity()
+
     # Calculate final statistics for each party
     stats = {}
-    num_parties = len(party_search_terms)
+    num_parties = len(party_registry.parties)
     
     for party, hashtag_counts in party_hashtags.items():
         total_hashtags = sum(hashtag_counts.values())
@@ -361,18 +315,26 @@ def get_tiktok_party_counts() -> Dict[str, Any]:
         else:
             video_history = []
         
+        if party in view_velocity:
+            velocity = view_velocity[party]
+            velocity_history = [
+                {"date": day.strftime("%Y-%m-%d"), "views": float(views)}
+                for day, views in velocity.items()
+            ]
+        else:
+            velocity_history = []
+
         stats[party] = {
-            "videos": party_videos[party],
+            "videos": [video.to_dict() for video in party_videos[party]],
             "top_hashtags": top_hashtags,
             "top_accounts": top_accounts,
             "overall_stats": overall_stats,
             "timeline": video_history,
+            "view_velocity": velocity_history,
             "hashtag": hashtag
         }
 
     return stats
 
 if __name__ == "__main__":
-    data = get_tiktok_party_counts()
-    # Ensure JSON serialization works by using default handler for dates
-    print(json.dumps(data, indent=2, default=str))
+    publish(__file__, get_tiktok_party_counts)
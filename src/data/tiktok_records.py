@@ -0,0 +1,176 @@
+"""
+Compact records for TikTok videos and comments.
+
+The API returns deeply nested dicts with dozens of fields per video. The fetchers
+decode them into these `__slots__` records right away, keeping only the fields we
+use. Authors are shared objects interned by their `unique_id`, and hashtags are
+stored as small integer ids into a shared vocabulary; both live for one
+`interning` scope.
+"""
+
+import re
+import sys
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+_authors: dict[str, "Author"] = {}
+_hashtag_ids: dict[str, int] = {}
+hashtag_names: list[str] = []
+_depth = 0
+
+
+@contextmanager
+def interning() -> Iterator[None]:
+    """
+    Scope the shared author and hashtag tables to one build (also usable as a
+    decorator). They are cleared when the outermost scope exits, so they do not
+    grow across runs in the daemon or the update mode; hashtag ids must be
+    resolved through `hashtag_names` within the scope.
+    """
+    global _depth
+    _depth += 1
+    try:
+        yield
+    finally:
+        _depth -= 1
+        if _depth == 0:
+            _authors.clear()
+            _hashtag_ids.clear()
+            hashtag_names.clear()
+
+
+def intern_hashtag(name: str) -> int:
+    """Get the interned id of a hashtag name."""
+    if name not in _hashtag_ids:
+        _hashtag_ids[name] = len(hashtag_names)
+        hashtag_names.append(sys.intern(name))
+    return _hashtag_ids[name]
+
+
+class Author:
+    __slots__ = ("unique_id", "nickname", "avatar")
+
+    def __init__(self, unique_id: str, nickname: str, avatar: str):
+        self.unique_id = unique_id
+        self.nickname = nickname
+        self.avatar = avatar
+
+    @classmethod
+    def from_api(cls, data: dict[str, Any]) -> "Author":
+        """Get the shared author record, updating its profile to the latest seen."""
+        unique_id = data["unique_id"]
+        author = _authors.get(unique_id)
+        if author is None:
+            author = _authors[unique_id] = cls(sys.intern(unique_id), "", "")
+        author.nickname = data["nickname"]
+        author.avatar = data["avatar"]
+        return author
+
+    def to_dict(self) -> dict[str, str]:
+        return {
+            "unique_id": self.unique_id,
+            "nickname": self.nickname,
+            "avatar": self.avatar,
+        }
+
+
+class Video:
+    __slots__ = (
+        "video_id",
+        "create_time",
+        "title",
+        "author",
+        "hashtags",
+        "origin_cover",
+        "play_count",
+        "digg_count",
+        "comment_count",
+        "share_count",
+    )
+
+    def __init__(
+        self,
+        video_id: str,
+        create_time: int,
+        title: str,
+        author: Author,
+        hashtags: tuple[int, ...],
+        origin_cover: str,
+        play_count: int,
+        digg_count: int,
+        comment_count: int,
+        share_count: int,
+    ):
+        self.video_id = video_id
+        self.create_time = create_time
+        self.title = title
+        self.author = author
+        self.hashtags = hashtags
+        self.origin_cover = origin_cover
+        self.play_count = play_count
+        self.digg_count = digg_count
+        self.comment_count = comment_count
+        self.share_count = share_count
+
+    @classmethod
+    def from_api(cls, data: dict[str, Any]) -> "Video":
+        """Decode a video from the API (or from `to_dict` output)."""
+        title = data["title"]
+        return cls(
+            video_id=sys.intern(data["video_id"]),
+            create_time=data["create_time"],
+            title=title,
+            author=Author.from_api(data["author"]),
+            hashtags=tuple(intern_hashtag(tag) for tag in re.findall(r"#(\w+)", title)),
+            origin_cover=data["origin_cover"],
+            play_count=data["play_count"],
+            digg_count=data["digg_count"],
+            comment_count=data["comment_count"],
+            share_count=data["share_count"],
+        )
+
+    @property
+    def url(self) -> str:
+        return f"https://www.tiktok.com/@{self.author.unique_id}/video/{self.video_id}"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "video_id": self.video_id,
+            "create_time": self.create_time,
+            "title": self.title,
+            "author": self.author.to_dict(),
+            "origin_cover": self.origin_cover,
+            "play_count": self.play_count,
+            "digg_count": self.digg_count,
+            "comment_count": self.comment_count,
+            "share_count": self.share_count,
+            "url": self.url,
+        }
+
+
+class Comment:
+    __slots__ = ("cid", "video_id", "create_time", "text")
+
+    def __init__(self, cid: str, video_id: str, create_time: int, text: str):
+        self.cid = cid
+        self.video_id = video_id
+        self.create_time = create_time
+        self.text = text
+
+    @classmethod
+    def from_api(cls, data: dict[str, Any]) -> "Comment":
+        """Decode a comment from the API (or from `to_dict` output)."""
+        return cls(
+            cid=data["cid"],
+            video_id=sys.intern(data["video_id"]),
+            create_time=data["create_time"],
+            text=data["text"],
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "cid": self.cid,
+            "video_id": self.video_id,
+            "create_time": self.create_time,
+            "text": self.text,
+        }
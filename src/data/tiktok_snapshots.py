@@ -0,0 +1,184 @@
+"""
+Daily snapshots of TikTok video metrics.
+
+We only ever see the current `play_count` of a video, so the views in
+`get_video_history_for_hashtag` are attributed to the posting date. Recording the
+counters at every crawl lets us difference them and get the views that actually
+happened between two crawls.
+
+Snapshots are kept in `.cache/state/tiktok/snapshots.npz` as integer columns sorted
+by (party, video id, day). Video ids are codes into a table of the unique ids, and
+the other columns are delta-encoded within a video's run; all are downcast to the
+smallest integer type that fits. Each snapshot also records the
+video's posting day, to tell new videos from old ones that were seen late.
+"""
+
+import os
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from tiktok_records import Video
+from util import STATE_DIR, state_lock
+
+SNAPSHOT_PATH = STATE_DIR / "tiktok" / "snapshots.npz"
+METRICS = ["play_count", "digg_count", "comment_count", "share_count"]
+KEY = ["party", "video_id", "day"]
+# Integer columns besides the key; `created` is the video's posting day
+VALUES = ["created"] + METRICS
+
+
+def _downcast(values: np.ndarray) -> np.ndarray:
+    """Use the smallest signed integer type that holds all values."""
+    if values.size == 0:
+        return values.astype(np.int8)
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= values.min() and values.max() <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def _run_starts(df: pd.DataFrame) -> np.ndarray:
+    """Mark the first row of each (party, video) run in a sorted frame."""
+    party = df["party"].to_numpy()
+    video_id = df["video_id"].to_numpy()
+    starts = np.ones(len(df), dtype=bool)
+    starts[1:] = (party[1:] != party[:-1]) | (video_id[1:] != video_id[:-1])
+    return starts
+
+
+def _encode(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    df = df.sort_values(KEY, ignore_index=True)
+    starts = _run_starts(df)
+    parties = df["party"].astype("category")
+    # Ids are 64-bit snowflakes, far apart even within a party, so they are stored
+    # once in a sorted table and referenced by small integer codes
+    video_ids, codes = np.unique(
+        df["video_id"].to_numpy(dtype=np.int64), return_inverse=True
+    )
+    arrays = {
+        "parties": np.array(parties.cat.categories, dtype=str),
+        "party": _downcast(parties.cat.codes.to_numpy()),
+        "video_ids": video_ids,
+        "video_id": _downcast(codes),
+    }
+    for column in ["day"] + VALUES:
+        values = df[column].to_numpy(dtype=np.int64)
+        deltas = np.diff(values, prepend=0)
+        deltas[starts] = values[starts]
+        arrays[column] = _downcast(deltas)
+    return arrays
+
+
+def _decode(arrays: dict[str, np.ndarray]) -> pd.DataFrame:
+    party = pd.Categorical.from_codes(arrays["party"], categories=arrays["parties"])
+    if "video_ids" in arrays:
+        video_id = arrays["video_ids"][arrays["video_id"]]
+    else:
+        # Files written before the id table held the ids delta-encoded
+        video_id = np.cumsum(arrays["video_id"], dtype=np.int64)
+    df = pd.DataFrame({"party": party, "video_id": video_id})
+    run = np.cumsum(_run_starts(df))
+    for column in ["day"] + VALUES:
+        # Snapshots from before `created` was recorded count as old videos
+        values = arrays.get(column, np.zeros(len(df), dtype=np.int8))
+        df[column] = pd.Series(values.astype(np.int64)).groupby(run).cumsum().to_numpy()
+    return df
+
+
+def load_snapshots() -> pd.DataFrame:
+    """Load all snapshots as a frame with one row per party, video and crawl day."""
+    if not SNAPSHOT_PATH.exists():
+        columns = {"party": pd.Categorical([])} | {c: [] for c in KEY[1:] + VALUES}
+        return pd.DataFrame(columns).astype({c: np.int64 for c in KEY[1:] + VALUES})
+    with np.load(SNAPSHOT_PATH) as arrays:
+        return _decode(dict(arrays))
+
+
+def record_snapshots(
+    party_videos: dict[str, list[Video]], crawl_date: date | None = None
+) -> None:
+    """
+    Store the current metrics of each party's videos for the given crawl date.
+    All parties of a crawl are written at once, under a lock, since the file is
+    rewritten as a whole.
+    """
+    crawl_date = crawl_date or date.today()
+    day = (crawl_date - date(1970, 1, 1)).days
+    new = pd.DataFrame(
+        [
+            {
+                "party": party,
+                "video_id": int(video.video_id),
+                "day": day,
+                "created": video.create_time // 86400,
+            }
+            | {metric: getattr(video, metric) for metric in METRICS}
+            for party, videos in party_videos.items()
+            for video in videos
+        ],
+        columns=KEY + VALUES,
+    )
+    with state_lock("tiktok/snapshots"):
+        old = load_snapshots()
+        old["party"] = old["party"].astype(str)
+        df = pd.concat([old, new], ignore_index=True)
+        # A repeated crawl on the same day replaces that day's values
+        df = df.drop_duplicates(KEY, keep="last")
+        SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so that readers never see a partial file
+        with tempfile.NamedTemporaryFile(
+            dir=SNAPSHOT_PATH.parent, suffix=".tmp", delete=False
+        ) as f:
+            np.savez_compressed(f, **_encode(df))
+        os.replace(f.name, SNAPSHOT_PATH)
+
+
+def get_view_velocity(metric: str = "play_count") -> pd.DataFrame:
+    """
+    Get daily view velocity per party, derived from the snapshot deltas.
+    The growth between two crawls is spread evenly over the days in between.
+    A video's first snapshot only counts if it was posted after the party's
+    previous crawl; otherwise (first crawl, or an older video that just entered the
+    crawled top n) its views have no known timing and it only serves as a baseline.
+    """
+    df = load_snapshots()
+    if df.empty:
+        return pd.DataFrame()
+    df = df.sort_values(KEY, ignore_index=True)
+    starts = _run_starts(df)
+    day = df["day"].to_numpy()
+    growth = np.diff(df[metric].to_numpy(), prepend=0)
+    gap = np.diff(day, prepend=0)
+    # The crawl day before each snapshot's day, per party (-1 if there is none)
+    previous = np.full(len(df), -1, dtype=np.int64)
+    for rows in df.groupby("party", observed=True).indices.values():
+        days = np.unique(day[rows])
+        i = np.searchsorted(days, day[rows])
+        previous[rows] = np.where(i > 0, days[np.maximum(i - 1, 0)], -1)
+    is_new = (previous >= 0) & (df["created"].to_numpy() >= previous)
+    growth[starts] = df[metric].to_numpy()[starts]
+    gap[starts] = (day - previous)[starts]
+    keep = ~starts | is_new
+    deltas = pd.DataFrame(
+        {
+            "party": df["party"].astype(str),
+            "day": day,
+            "gap": gap,
+            "rate": np.clip(growth, 0, None) / gap,
+        }
+    )[keep]
+    # Nothing to difference yet, e.g. on the first crawl day
+    if deltas.empty:
+        return pd.DataFrame()
+    # Expand each delta over the days since the previous snapshot
+    deltas = deltas.loc[deltas.index.repeat(deltas["gap"])]
+    deltas["day"] -= deltas.groupby(level=0).cumcount()
+    ts = deltas.pivot_table(
+        index="day", columns="party", values="rate", aggfunc="sum", fill_value=0
+    )
+    ts.index = pd.to_datetime(ts.index, unit="D")
+    ts = ts.reindex(pd.date_range(start=ts.index.min(), end=ts.index.max()))
+    return ts.fillna(0)
@@ -0,0 +1,92 @@
+"""
+Near-real-time update mode for campaign nights.
+
+Instead of rebuilding everything once a day, `python update.py` polls each source
+on its own interval, re-runs only the loaders that depend on it, and writes their
+output into Observable's loader cache, so that `npm run dev` picks it up. The
+cached fetchers of the loader being refreshed are re-executed (see
+`util.refresh`), but the sources only fetch what is new: media counts and ACLED
+events since their last stored day, polls with a conditional request, and TikTok
+down to the first known video. Outputs that did not change are not rewritten.
+"""
+
+import argparse
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+from daemon import DATA_DIR, run_loader
+from util import refresh
+
+OBSERVABLE_CACHE_DIR = os.path.join(
+    os.path.dirname(DATA_DIR), ".observablehq", "cache", "data"
+)
+
+# loader -> seconds between refreshes
+SCHEDULE = {
+    "polls.json.py": 15 * 60,
+    "tiktok.json.py": 60 * 60,
+    "tiktok_details.json.py": 60 * 60,
+    "media.json.py": 3 * 60 * 60,
+    "rallies.json.py": 24 * 60 * 60,
+    "lead_lag.json.py": 6 * 60 * 60,
+}
+
+# loader -> loaders that are derived from its data and are regenerated with it
+DEPENDENTS = {
+    "rallies.json.py": ["rally_cube.json.py"],
+}
+
+# Scheduled loaders that only combine the stored sources, without crawling
+DERIVED = {"lead_lag.json.py"}
+
+
+def write_artifact(loader: str, payload: bytes) -> bool:
+    """Write a loader's output to Observable's cache, unless it is unchanged."""
+    path = os.path.join(OBSERVABLE_CACHE_DIR, loader.removesuffix(".py"))
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == payload:
+                return False
+    os.makedirs(OBSERVABLE_CACHE_DIR, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(payload)
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def update(loader: str) -> None:
+    """Re-fetch a source and regenerate the artifacts that depend on it."""
+    with refresh() if loader not in DERIVED else nullcontext():
+        payloads = {loader: run_loader(os.path.join(DATA_DIR, loader))}
+    for dependent in DEPENDENTS.get(loader, []):
+        payloads[dependent] = run_loader(os.path.join(DATA_DIR, dependent))
+    for name, payload in payloads.items():
+        if write_artifact(name, payload):
+            print(f"Updated {name.removesuffix('.py')}", file=sys.stderr)
+
+
+def run(once: bool = False) -> None:
+    due = {loader: 0.0 for loader in SCHEDULE}
+    while True:
+        for loader, next_run in sorted(due.items(), key=lambda item: item[1]):
+            if next_run > time.time():
+                continue
+            try:
+                update(loader)
+            except Exception as e:
+                print(f"Error updating {loader}: {e}", file=sys.stderr)
+            due[loader] = time.time() + SCHEDULE[loader]
+        if once:
+            return
+        time.sleep(max(0, min(due.values()) - time.time()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--once", action="store_true", help="update every source once and exit"
+    )
+    args = parser.parse_args()
+    run(once=args.once)
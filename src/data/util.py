@@ -1,6 +1,97 @@
+import fcntl
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Iterator
+
 from dotenv import load_dotenv
 from joblib.memory import Memory
 
 load_dotenv()
-memory = Memory(location=".cache", verbose=0)
-cache = memory.cache
+# Anchored here, so loaders share the cache whether run by Observable (from the
+# project root), the daemon, the update mode or CI (from src/data)
+CACHE_DIR = Path(__file__).parent / ".cache"
+memory = Memory(location=CACHE_DIR, verbose=0)
+
+# While set, cached functions are re-executed and their cache entries replaced
+_refreshing = False
+
+
+def cache(func: Callable) -> Callable:
+    """Cache a function on disk (see `refresh` to force fresh results)."""
+    cached = memory.cache(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _refreshing:
+            output, _ = cached.call(*args, **kwargs)
+            return output
+        return cached(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def refresh() -> Iterator[None]:
+    """Re-fetch instead of reading from the cache within this block."""
+    global _refreshing
+    previous, _refreshing = _refreshing, True
+    try:
+        yield
+    finally:
+        _refreshing = previous
+
+# Small persistent state (checkpoints, incremental stores) lives next to the cache
+STATE_DIR = CACHE_DIR / "state"
+
+
+def load_state(name: str) -> dict[str, Any]:
+    """Load a named JSON state file, or an empty dict if there is none yet."""
+    path = STATE_DIR / f"{name}.json"
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(name: str, state: dict[str, Any]) -> None:
+    """Atomically write a named JSON state file."""
+    path = STATE_DIR / f"{name}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temporary file, so that concurrent writers don't clobber each other
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+    ) as f:
+        json.dump(state, f)
+    os.replace(f.name, path)
+
+
+@contextmanager
+def state_lock(name: str) -> Iterator[None]:
+    """Hold an exclusive lock on a named state, for read-modify-write updates."""
+    path = STATE_DIR / f"{name}.lock"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def import_loader(filename: str) -> ModuleType:
+    """Import a `*.json.py` loader as a module, to reuse its functions."""
+    name = filename.removesuffix(".py").replace(".", "_")
+    if name not in sys.modules:
+        path = Path(__file__).parent / filename
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]